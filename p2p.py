@@ -18,8 +18,161 @@ import cv2
 import numpy as np
 import pickle
 import struct
+import ssl
+import hashlib
+import subprocess
+import queue
 from pathlib import Path
 
+# TLS 1.2 suites compared by /tlsbench (TLS 1.3 suites can't be pinned from Python)
+TLS_BENCH_CIPHERS = [
+    "ECDHE-ECDSA-AES128-GCM-SHA256",
+    "ECDHE-ECDSA-AES256-GCM-SHA384",
+    "ECDHE-ECDSA-CHACHA20-POLY1305"
+]
+
+# Seconds to wait for a TLS handshake before giving up on the peer
+TLS_HANDSHAKE_TIMEOUT = 10
+
+# Per-frame entry in a recording's .idx file: byte offset, size, receive time
+RECORD_INDEX = struct.Struct("!QId")
+
+# Index entries are held back and written in batches, after the frame data they point at
+INDEX_FLUSH_FRAMES = 64
+
+
+class VideoRecorder(threading.Thread):
+    """Writes received JPEG frames untouched into segmented .mjpeg files.
+
+    Frames are handed over through a bounded queue and written by this
+    thread, so a slow disk drops frames instead of stalling the socket reader.
+    Each segment gets a sibling .idx file of RECORD_INDEX entries for seeking.
+    """
+
+    def __init__(self, directory, name, segment_frames=3000, queue_size=256):
+        super().__init__()
+        self.daemon = True
+        self.directory = directory
+        self.name = name
+        self.segment_frames = segment_frames
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.stopping = threading.Event()
+        self.segments = []
+        self.frames = 0
+        # Separate counters so the reader and writer threads never share one
+        self.queue_drops = 0
+        self.disk_drops = 0
+        self.error = None
+        self.data_file = None
+        self.index_file = None
+        self.pending_index = bytearray()
+        self.segment_frame_count = 0
+        self.offset = 0
+
+    def write(self, frame_data):
+        try:
+            self.queue.put_nowait((time.time(), frame_data))
+        except queue.Full:
+            self.queue_drops += 1
+
+    def close(self, timeout=None):
+        # Never block on a full queue; run() exits on its own once the
+        # queue is drained and stopping is set
+        self.stopping.set()
+        try:
+            self.queue.put_nowait(None)
+        except queue.Full:
+            pass
+        self.join(timeout)
+        return not self.is_alive()
+
+    def run(self):
+        while True:
+            try:
+                item = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                if self.stopping.is_set():
+                    break
+                continue
+            if item is None:
+                break
+
+            # After a disk error keep draining, so write() never sees a stuck queue
+            if self.error:
+                self.disk_drops += 1
+                continue
+
+            try:
+                self.write_frame(*item)
+            except OSError as e:
+                self.error = e
+                self.disk_drops += 1
+                self.close_segment()
+
+        self.close_segment()
+
+    def write_frame(self, timestamp, frame_data):
+        if self.data_file is None or self.segment_frame_count >= self.segment_frames:
+            self.close_segment()
+            path = os.path.join(self.directory, f"{self.name}_{len(self.segments):04d}.mjpeg")
+            self.data_file = open(path, 'wb', buffering=1024 * 1024)
+            self.index_file = open(os.path.splitext(path)[0] + ".idx", 'wb')
+            self.segments.append(path)
+            self.segment_frame_count = 0
+            self.offset = 0
+
+        self.data_file.write(frame_data)
+        self.pending_index += RECORD_INDEX.pack(self.offset, len(frame_data), timestamp)
+        self.offset += len(frame_data)
+        self.segment_frame_count += 1
+        self.frames += 1
+
+        if len(self.pending_index) >= INDEX_FLUSH_FRAMES * RECORD_INDEX.size:
+            self.flush_segment()
+
+    def flush_segment(self):
+        # Data reaches the file before any index entry pointing at it
+        self.data_file.flush()
+        self.index_file.write(self.pending_index)
+        self.index_file.flush()
+        self.pending_index = bytearray()
+
+    def close_segment(self):
+        if self.data_file is not None and self.error is None:
+            try:
+                self.flush_segment()
+            except OSError as e:
+                self.error = e
+        self.pending_index = bytearray()
+
+        for f in (self.data_file, self.index_file):
+            if f is None:
+                continue
+            try:
+                f.close()
+            except OSError as e:
+                self.error = self.error or e
+        self.data_file = None
+        self.index_file = None
+
+    @staticmethod
+    def read_frame(segment_path, frame_number):
+        if frame_number < 0:
+            raise IndexError(f"Frame {frame_number} is not in {segment_path}")
+        with open(os.path.splitext(segment_path)[0] + ".idx", 'rb') as f:
+            f.seek(frame_number * RECORD_INDEX.size)
+            entry = f.read(RECORD_INDEX.size)
+        if len(entry) < RECORD_INDEX.size:
+            raise IndexError(f"Frame {frame_number} is not in {segment_path}")
+        offset, size, _ = RECORD_INDEX.unpack(entry)
+        with open(segment_path, 'rb') as f:
+            f.seek(offset)
+            data = f.read(size)
+        if len(data) != size:
+            raise IndexError(f"Frame {frame_number} is truncated in {segment_path}")
+        return data
+
+
 class ChatApp(npyscreen.NPSAppManaged):
     def onStart(self):
         # Initialize settings and language
@@ -63,11 +216,29 @@ class ChatApp(npyscreen.NPSAppManaged):
         self.video_streaming = False
         self.receiving_video = False
         self.file_transfer_active = False
+        self.recording_video = False
+        self.video_display = True
+        self.video_stream_display = False
+        self.video_tls = False
+        self.video_tls_reply = threading.Event()
+        self.video_recorder = None
+        self.recorder_lock = threading.Lock()
+        self.recording_finishers = []
         self.download_dir = os.path.join(os.path.expanduser("~"), "Downloads", "P2P-Chat")
         
         if not os.path.exists(self.download_dir):
             os.makedirs(self.download_dir)
 
+        self.recording_dir = os.path.join(self.download_dir, "recordings")
+
+        # TLS variables
+        self.tls_enabled = False
+        self.tls_server_context = None
+        self.tls_client_context = None
+        self.tls_sessions = {}
+        self.tls_fingerprint = ""
+        self.cert_dir = os.path.join(os.path.expanduser("~"), ".p2p-chat", "certs")
+
         # Start server and client
         self.chatServer = server.Server(self)
         self.chatServer.daemon = True
@@ -94,7 +265,11 @@ class ChatApp(npyscreen.NPSAppManaged):
             "video": [self.toggle_video, 0],
             "acceptfile": [self.accept_file, 0],
             "rejectfile": [self.reject_file, 0],
-            "listfiles": [self.list_downloaded_files, 0]
+            "listfiles": [self.list_downloaded_files, 0],
+            "record": [self.toggle_recording, 0],
+            "display": [self.toggle_video_display, 0],
+            "tls": [self.toggle_tls, 0],
+            "tlsbench": [self.tls_benchmark, 0]
         }
 
         # Command aliases
@@ -107,7 +282,8 @@ class ChatApp(npyscreen.NPSAppManaged):
             "v": "video",
             "af": "acceptfile",
             "rf": "rejectfile",
-            "lf": "listfiles"
+            "lf": "listfiles",
+            "rec": "record"
         }
         
         # File transfer variables
@@ -157,6 +333,8 @@ class ChatApp(npyscreen.NPSAppManaged):
             self.receiving_video = False
             if hasattr(self, 'receive_video_thread') and self.receive_video_thread.is_alive():
                 self.receive_video_thread.join(timeout=1)
+        
+        self.stop_recording()
                 
         if hasattr(self, 'video_socket') and self.video_socket:
             try:
@@ -284,6 +462,8 @@ class ChatApp(npyscreen.NPSAppManaged):
         self.chatClient.stop()
         self.chatServer.stop()
         self.stop_video_streaming()
+        # Let recordings finish writing before the daemon threads go away
+        self.wait_for_recordings()
         self.clean_file_transfer_resources()
         exit(1)
 
@@ -334,9 +514,11 @@ class ChatApp(npyscreen.NPSAppManaged):
         if not self.nickname == "": self.sysMsg(self.lang['nicknameStatusMessage'].format(self.nickname))
         self.sysMsg(f"Video Streaming: {self.video_streaming}")
         self.sysMsg(f"Receiving Video: {self.receiving_video}")
+        self.sysMsg(f"Recording Video: {self.recording_video} (display {'on' if self.video_display else 'off'})")
         self.sysMsg(f"File Transfer Active: {self.file_transfer_active}")
         self.sysMsg(f"Pending File Transfer: {'Yes' if self.pending_file_transfer else 'No'}")
         self.sysMsg(f"Download Directory: {self.download_dir}")
+        self.sysMsg(f"TLS: {self.tls_enabled} ({len(self.tls_sessions)} cached sessions)")
     
     # FILE TRANSFER METHODS
     
@@ -357,7 +539,8 @@ class ChatApp(npyscreen.NPSAppManaged):
             "command": "file_request",
             "file_name": file_name,
             "file_size": file_size,
-            "sender": self.nickname or "Anonymous"
+            "sender": self.nickname or "Anonymous",
+            "tls": self.tls_enabled
         }
         
         self.chatClient.send(f"\b/file_request {json.dumps(file_info)}")
@@ -370,6 +553,8 @@ class ChatApp(npyscreen.NPSAppManaged):
         
         self.sysMsg(f"File transfer request from {file_info['sender']}")
         self.sysMsg(f"File: {file_info['file_name']} ({file_info['file_size']} bytes)")
+        if file_info.get('tls'):
+            self.sysMsg("Sender requires TLS for this transfer")
         self.sysMsg("Type /acceptfile to accept or /rejectfile to decline")
     
     def accept_file(self):
@@ -377,16 +562,24 @@ class ChatApp(npyscreen.NPSAppManaged):
             self.sysMsg("No pending file transfers.")
             return
         
+        # Follow the sender's choice so both ends agree on TLS
+        use_tls = self.pending_file_transfer.get('tls', False)
+        if use_tls and not self.ensure_tls_contexts():
+            self.sysMsg("Unable to use TLS requested by sender, rejecting transfer")
+            self.reject_file()
+            return
+        
         self.sysMsg(f"Accepted file transfer for {self.pending_file_transfer['file_name']}")
         
         response = {
             "command": "file_accepted",
-            "file_name": self.pending_file_transfer['file_name']
+            "file_name": self.pending_file_transfer['file_name'],
+            "tls": use_tls
         }
         
         self.chatClient.send(f"\b/file_accepted {json.dumps(response)}")
         
-        self.file_transfer_thread = threading.Thread(target=self.receive_file)
+        self.file_transfer_thread = threading.Thread(target=self.receive_file, args=(use_tls,))
         self.file_transfer_thread.daemon = True
         self.file_transfer_thread.start()
     
@@ -409,7 +602,7 @@ class ChatApp(npyscreen.NPSAppManaged):
         response = json.loads(response_data)
         self.sysMsg(f"Peer accepted file transfer for {response['file_name']}")
         
-        self.file_transfer_thread = threading.Thread(target=self.send_file, args=(self.pending_outgoing_file,))
+        self.file_transfer_thread = threading.Thread(target=self.send_file, args=(self.pending_outgoing_file, response.get('tls', False)))
         self.file_transfer_thread.daemon = True
         self.file_transfer_thread.start()
     
@@ -418,7 +611,7 @@ class ChatApp(npyscreen.NPSAppManaged):
         self.sysMsg(f"Peer rejected file transfer for {response['file_name']}")
         self.pending_outgoing_file = None
     
-    def send_file(self, file_path):
+    def send_file(self, file_path, use_tls=False):
         try:
             self.file_transfer_active = True
             
@@ -430,6 +623,7 @@ class ChatApp(npyscreen.NPSAppManaged):
             self.sysMsg(f"Waiting for peer to connect for file transfer on port {self.file_transfer_port}")
             
             conn, addr = self.file_socket.accept()
+            conn = self.secure_server_socket(conn, use_tls)
             self.sysMsg(f"Peer connected from {addr[0]}:{addr[1]} for file transfer")
             
             file_size = os.path.getsize(file_path)
@@ -462,12 +656,13 @@ class ChatApp(npyscreen.NPSAppManaged):
                 self.file_socket = None
             self.pending_outgoing_file = None
     
-    def receive_file(self):
+    def receive_file(self, use_tls=False):
         try:
             self.file_transfer_active = True
             
             self.file_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.file_socket.connect((self.peerIP, self.file_transfer_port))
+            self.file_socket = self.secure_client_socket(self.file_socket, self.peerIP, use_tls)
             
             metadata_size = struct.unpack("!I", self.file_socket.recv(4))[0]
             metadata = json.loads(self.file_socket.recv(metadata_size))
@@ -491,6 +686,7 @@ class ChatApp(npyscreen.NPSAppManaged):
                     if bytes_received % 40960 == 0:
                         self.sysMsg(f"Received {bytes_received}/{file_size} bytes ({bytes_received/file_size*100:.1f}%)")
             
+            self.remember_tls_session(self.file_socket, self.peerIP)
             self.sysMsg(f"File received and saved to {file_path}")
             
         except Exception as e:
@@ -538,7 +734,15 @@ class ChatApp(npyscreen.NPSAppManaged):
                     return
                 cap.release()
                 
-                self.chatClient.send("\b/video_start")
+                # With TLS on, the stream waits for the peer's /video_accepted
+                # reply; the bare message keeps plaintext peers working as before
+                self.video_tls = False
+                self.video_tls_reply.clear()
+                if self.tls_enabled:
+                    self.chatClient.send(f"\b/video_start {json.dumps({'tls': True})}")
+                else:
+                    self.video_tls_reply.set()
+                    self.chatClient.send("\b/video_start")
                 self.sysMsg("Starting video stream...")
                 
                 self.video_streaming = True
@@ -549,25 +753,45 @@ class ChatApp(npyscreen.NPSAppManaged):
             except Exception as e:
                 self.sysMsg(f"Error accessing camera: {str(e)}")
     
-    def handle_video_start(self):
+    def handle_video_start(self, video_info=None):
         if self.receiving_video:
             self.sysMsg("Already receiving video from peer.")
             return
+        
+        use_tls = json.loads(video_info).get('tls', False) if video_info else False
+        if use_tls:
+            if not self.ensure_tls_contexts():
+                self.sysMsg("Unable to use TLS requested by peer, not receiving video.")
+                self.chatClient.send(f"\b/video_rejected {json.dumps({'tls': True})}")
+                return
+            self.chatClient.send(f"\b/video_accepted {json.dumps({'tls': True})}")
             
         self.sysMsg("Peer is starting video stream. Preparing to receive...")
         
         self.receiving_video = True
-        self.receive_video_thread = threading.Thread(target=self.receive_video)
+        self.receive_video_thread = threading.Thread(target=self.receive_video, args=(use_tls,))
         self.receive_video_thread.daemon = True
         self.receive_video_thread.start()
     
+    def handle_video_accepted(self, response_data):
+        response = json.loads(response_data)
+        self.video_tls = response.get('tls', False)
+        self.video_tls_reply.set()
+    
+    def handle_video_rejected(self, response_data):
+        self.sysMsg("Peer could not set up TLS for video, stopping stream.")
+        self.video_streaming = False
+        self.video_tls_reply.set()
+        self.stop_video_streaming()
+    
     def handle_video_stop(self):
         if not self.receiving_video:
             return
             
         self.receiving_video = False
         self.sysMsg("Peer stopped video stream.")
-        cv2.destroyAllWindows()
+        if self.video_stream_display:
+            cv2.destroyAllWindows()
     
     def stream_video(self):
         try:
@@ -579,6 +803,11 @@ class ChatApp(npyscreen.NPSAppManaged):
             self.sysMsg(f"Waiting for peer to connect for video on port {self.video_port}")
             
             conn, addr = self.video_socket.accept()
+            if not self.video_tls_reply.wait(TLS_HANDSHAKE_TIMEOUT) or not self.video_streaming:
+                conn.close()
+                self.sysMsg("Peer did not accept the TLS video stream")
+                return
+            conn = self.secure_server_socket(conn, self.video_tls)
             self.sysMsg(f"Peer connected from {addr[0]}:{addr[1]} for video")
             
             cap = cv2.VideoCapture(0)
@@ -625,17 +854,25 @@ class ChatApp(npyscreen.NPSAppManaged):
                 self.video_socket.close()
                 self.video_socket = None
     
-    def receive_video(self):
+    def receive_video(self, use_tls=False):
         try:
             self.video_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.video_socket.connect((self.peerIP, self.video_port))
+            self.video_socket = self.secure_client_socket(self.video_socket, self.peerIP, use_tls)
             
             metadata_size = struct.unpack("!I", self.video_socket.recv(4))[0]
             metadata = json.loads(self.video_socket.recv(metadata_size))
+            self.remember_tls_session(self.video_socket, self.peerIP)
             
             self.sysMsg(f"Receiving video: {metadata['width']}x{metadata['height']} at {metadata['fps']} FPS")
             
-            cv2.namedWindow(f"Video from {self.peer or 'Peer'}", cv2.WINDOW_NORMAL)
+            if self.recording_video:
+                self.start_recording()
+
+            # Snapshot per stream so /display can't desync window cleanup
+            self.video_stream_display = self.video_display
+            if self.video_stream_display:
+                cv2.namedWindow(f"Video from {self.peer or 'Peer'}", cv2.WINDOW_NORMAL)
             
             while self.receiving_video:
                 try:
@@ -652,6 +889,18 @@ class ChatApp(npyscreen.NPSAppManaged):
                             break
                         frame_data += chunk
                     
+                    # Peer went away mid-frame; don't record a truncated JPEG
+                    if len(frame_data) < frame_size:
+                        break
+                    
+                    recorder = self.video_recorder
+                    if recorder:
+                        recorder.write(frame_data)
+
+                    # Headless nodes skip decoding entirely
+                    if not self.video_stream_display:
+                        continue
+
                     frame = cv2.imdecode(np.frombuffer(frame_data, dtype=np.uint8), cv2.IMREAD_COLOR)
                     
                     if frame is not None:
@@ -664,17 +913,294 @@ class ChatApp(npyscreen.NPSAppManaged):
                     self.sysMsg(f"Error receiving video frame: {str(e)}")
                     break
             
-            cv2.destroyAllWindows()
+            if self.video_stream_display:
+                cv2.destroyAllWindows()
             self.sysMsg("Video stream ended")
             
         except Exception as e:
             self.sysMsg(f"Error in video reception: {str(e)}")
         finally:
+            self.stop_recording()
             self.receiving_video = False
             if hasattr(self, 'video_socket') and self.video_socket:
                 self.video_socket.close()
                 self.video_socket = None
 
+    # RECORDING METHODS
+
+    def toggle_recording(self):
+        if self.recording_video:
+            self.recording_video = False
+            self.stop_recording()
+            self.sysMsg("Video recording disabled")
+            return
+
+        self.recording_video = True
+        self.sysMsg(f"Received video will be recorded to {self.recording_dir}")
+        if self.receiving_video:
+            self.start_recording()
+
+    def toggle_video_display(self):
+        self.video_display = not self.video_display
+        self.sysMsg(f"Video display {'enabled' if self.video_display else 'disabled'} (applies to the next stream)")
+
+    def start_recording(self):
+        with self.recorder_lock:
+            if self.video_recorder:
+                return
+
+            try:
+                os.makedirs(self.recording_dir, exist_ok=True)
+            except OSError as e:
+                self.sysMsg(f"Unable to create recording directory: {str(e)}")
+                return
+
+            name = "video_" + datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+            self.video_recorder = VideoRecorder(self.recording_dir, name)
+            self.video_recorder.start()
+        self.sysMsg(f"Recording video to {os.path.join(self.recording_dir, name)}_*.mjpeg")
+
+    def stop_recording(self):
+        with self.recorder_lock:
+            recorder = self.video_recorder
+            if not recorder:
+                return
+            self.video_recorder = None
+
+            # Flushing can take a while on a slow disk, so it never runs on
+            # the caller's (possibly UI) thread. Not a daemon, so exit waits for it
+            finisher = threading.Thread(target=self.finish_recording, args=(recorder,))
+            self.recording_finishers = [t for t in self.recording_finishers if t.is_alive()]
+            self.recording_finishers.append(finisher)
+            finisher.start()
+
+    def finish_recording(self, recorder):
+        recorder.close()
+        if recorder.error:
+            self.sysMsg(f"Error writing recording: {str(recorder.error)}")
+        dropped = recorder.queue_drops + recorder.disk_drops
+        self.sysMsg(f"Recorded {recorder.frames} frames in {len(recorder.segments)} segment(s), {dropped} dropped")
+
+    def wait_for_recordings(self):
+        with self.recorder_lock:
+            finishers = list(self.recording_finishers)
+        for finisher in finishers:
+            finisher.join()
+
+    # TLS METHODS
+
+    def toggle_tls(self):
+        if self.tls_enabled:
+            self.tls_enabled = False
+            self.sysMsg("TLS disabled for file and video transfers")
+            return
+
+        if not self.ensure_tls_contexts():
+            return
+
+        self.tls_enabled = True
+        self.sysMsg("TLS enabled for file and video transfers you start")
+        self.sysMsg(f"Your certificate fingerprint: {self.tls_fingerprint}")
+
+    def ensure_tls_certificate(self):
+        cert_file = os.path.join(self.cert_dir, "cert.pem")
+        key_file = os.path.join(self.cert_dir, "key.pem")
+        if os.path.exists(cert_file) and os.path.exists(key_file):
+            return cert_file, key_file
+
+        os.makedirs(self.cert_dir, mode=0o700, exist_ok=True)
+        os.chmod(self.cert_dir, 0o700)
+        # Self-signed P-256 cert; ECDSA keeps the full handshake cheap.
+        # The umask keeps the key private from the moment openssl creates it
+        old_umask = os.umask(0o077)
+        try:
+            subprocess.run([
+                "openssl", "req", "-x509", "-newkey", "ec",
+                "-pkeyopt", "ec_paramgen_curve:prime256v1", "-nodes",
+                "-keyout", key_file, "-out", cert_file,
+                "-days", "365", "-subj", "/CN=p2p-chat"
+            ], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        finally:
+            os.umask(old_umask)
+        os.chmod(key_file, 0o600)
+        return cert_file, key_file
+
+    def new_tls_contexts(self):
+        cert_file, key_file = self.ensure_tls_certificate()
+
+        server_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        server_context.load_cert_chain(cert_file, key_file)
+
+        # Peers use self-signed certs, so there is no CA to verify against;
+        # users compare the fingerprints shown on connect instead
+        client_context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        client_context.check_hostname = False
+        client_context.verify_mode = ssl.CERT_NONE
+
+        return server_context, client_context
+
+    def ensure_tls_contexts(self):
+        return self.tls_client_context is not None or self.load_tls_contexts()
+
+    def load_tls_contexts(self):
+        try:
+            self.tls_server_context, self.tls_client_context = self.new_tls_contexts()
+            with open(os.path.join(self.cert_dir, "cert.pem")) as f:
+                cert = ssl.PEM_cert_to_DER_cert(f.read())
+        except (OSError, ssl.SSLError, subprocess.CalledProcessError) as e:
+            self.sysMsg(f"Unable to set up TLS: {str(e)}")
+            self.tls_server_context = None
+            self.tls_client_context = None
+            return False
+
+        # Sessions are bound to the context that created them
+        self.tls_sessions = {}
+        self.tls_fingerprint = hashlib.sha256(cert).hexdigest()
+        return True
+
+    def secure_server_socket(self, conn, use_tls):
+        if not use_tls:
+            return conn
+
+        # One shared server context, so its ticket keys accept resumption
+        # from sessions issued on earlier file or video connections
+        conn.settimeout(TLS_HANDSHAKE_TIMEOUT)
+        try:
+            conn = self.tls_server_context.wrap_socket(conn, server_side=True)
+        except (OSError, ValueError):
+            conn.close()
+            raise
+        conn.settimeout(None)
+        return conn
+
+    def secure_client_socket(self, sock, peer_ip, use_tls):
+        if not use_tls:
+            return sock
+
+        session = self.tls_sessions.get(peer_ip)
+        sock.settimeout(TLS_HANDSHAKE_TIMEOUT)
+        sock = self.tls_client_context.wrap_socket(sock, session=session)
+        sock.settimeout(None)
+
+        if not sock.session_reused:
+            fingerprint = hashlib.sha256(sock.getpeercert(binary_form=True)).hexdigest()
+            self.sysMsg(f"TLS ({sock.version()}) peer fingerprint: {fingerprint}")
+        return sock
+
+    def remember_tls_session(self, sock, peer_ip):
+        # TLS 1.3 tickets arrive after the handshake, so call this once
+        # some data has been read from the peer
+        if isinstance(sock, ssl.SSLSocket) and sock.session is not None:
+            self.tls_sessions[peer_ip] = sock.session
+
+    def tls_benchmark(self):
+        bench_thread = threading.Thread(target=self.run_tls_benchmark)
+        bench_thread.daemon = True
+        bench_thread.start()
+
+    def run_tls_benchmark(self, rounds=20, bulk_size=16 * 1024 * 1024):
+        if not self.ensure_tls_contexts():
+            return
+
+        self.sysMsg(f"TLS benchmark on loopback: {rounds} handshakes, {bulk_size // (1024 * 1024)} MB bulk")
+        try:
+            full, _ = self.bench_handshakes(self.tls_server_context, self.tls_client_context, rounds, False)
+            resumed, reused = self.bench_handshakes(self.tls_server_context, self.tls_client_context, rounds, True)
+            self.sysMsg(f"Full handshake: {full * 1000:.2f} ms")
+            self.sysMsg(f"Resumed handshake: {resumed * 1000:.2f} ms ({reused}/{rounds} resumed, {full / resumed:.1f}x)")
+
+            self.sysMsg(f"Plaintext: {self.bench_throughput(None, None, bulk_size):.1f} MB/s")
+            self.sysMsg(f"TLS default: {self.bench_throughput(self.tls_server_context, self.tls_client_context, bulk_size):.1f} MB/s")
+
+            for cipher in TLS_BENCH_CIPHERS:
+                try:
+                    server_context, client_context = self.new_tls_contexts()
+                    for context in (server_context, client_context):
+                        context.maximum_version = ssl.TLSVersion.TLSv1_2
+                        context.set_ciphers(cipher)
+                except ssl.SSLError:
+                    self.sysMsg(f"{cipher}: not supported")
+                    continue
+                self.sysMsg(f"{cipher}: {self.bench_throughput(server_context, client_context, bulk_size):.1f} MB/s")
+
+        except (OSError, subprocess.CalledProcessError) as e:
+            self.sysMsg(f"Error in TLS benchmark: {str(e)}")
+
+    def bench_serve(self, listener, context, connections, payload):
+        for _ in range(connections):
+            try:
+                conn, _ = listener.accept()
+            except OSError:
+                return
+            try:
+                if context:
+                    conn = context.wrap_socket(conn, server_side=True)
+                conn.sendall(payload)
+            except OSError:
+                pass
+            finally:
+                conn.close()
+
+    def bench_handshakes(self, server_context, client_context, rounds, resume):
+        listener = socket.create_server(("127.0.0.1", 0))
+        port = listener.getsockname()[1]
+
+        # One extra connection up front to warm up and seed the session
+        server_thread = threading.Thread(target=self.bench_serve, args=(listener, server_context, rounds + 1, b'\0'))
+        server_thread.daemon = True
+        server_thread.start()
+
+        session = None
+        timings = []
+        reused = 0
+        try:
+            for i in range(rounds + 1):
+                start = time.perf_counter()
+                sock = socket.create_connection(("127.0.0.1", port))
+                sock = client_context.wrap_socket(sock, session=session)
+                elapsed = time.perf_counter() - start
+
+                sock.recv(1)
+                if resume:
+                    session = sock.session
+                if i > 0:
+                    timings.append(elapsed)
+                    reused += sock.session_reused
+                sock.close()
+        finally:
+            listener.close()
+            server_thread.join(timeout=5)
+
+        return sum(timings) / len(timings), reused
+
+    def bench_throughput(self, server_context, client_context, size):
+        listener = socket.create_server(("127.0.0.1", 0))
+        port = listener.getsockname()[1]
+
+        server_thread = threading.Thread(target=self.bench_serve, args=(listener, server_context, 1, os.urandom(size)))
+        server_thread.daemon = True
+        server_thread.start()
+
+        buffer = bytearray(65536)
+        received = 0
+        try:
+            start = time.perf_counter()
+            sock = socket.create_connection(("127.0.0.1", port))
+            if client_context:
+                sock = client_context.wrap_socket(sock)
+            while received < size:
+                n = sock.recv_into(buffer)
+                if not n:
+                    break
+                received += n
+            elapsed = time.perf_counter() - start
+            sock.close()
+        finally:
+            listener.close()
+            server_thread.join(timeout=5)
+
+        return received / elapsed / (1024 * 1024)
+
 if __name__ == "__main__":
     App = ChatApp()
     App.run()